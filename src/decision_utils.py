@@ -33,6 +33,26 @@ def class_probs_from_S_tau(S_tau_row: np.ndarray) -> np.ndarray:
     return p / s if s > 0 else np.array([1.0, 0.0, 0.0, 0.0, 0.0], dtype=float)
 
 
+def class_probs_from_S_tau_matrix(S_tau: np.ndarray) -> np.ndarray:
+    """Vektorisierte Variante von ``class_probs_from_S_tau`` für viele Samples.
+
+    Args:
+        S_tau (np.ndarray): Überlebenswahrscheinlichkeiten an den Klassengrenzen,
+            Matrix der Form (n_samples, 4) mit Spalten [S1, S2, S3, S4].
+
+    Returns:
+        np.ndarray: Normalisierte Klassenwahrscheinlichkeiten der Form
+        (n_samples, 5) mit Spalten (p0, p1, p2, p3, p4).
+    """
+    S_tau = np.asarray(S_tau, dtype=float)
+    S1, S2, S3, S4 = S_tau[:, 0], S_tau[:, 1], S_tau[:, 2], S_tau[:, 3]
+    p = np.column_stack([S4, S3 - S4, S2 - S3, S1 - S2, 1.0 - S1])
+    p = np.clip(p, 0.0, 1.0)
+    s = p.sum(axis=1, keepdims=True)
+    fallback = np.array([1.0, 0.0, 0.0, 0.0, 0.0], dtype=float)
+    return np.where(s > 0, p / np.where(s > 0, s, 1.0), fallback)
+
+
 def decide_with_cost_from_rsf_at_taus(
     rsf, X: np.ndarray, taus: np.ndarray, cost: np.ndarray
 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
@@ -0,0 +1,418 @@
+import os
+import json
+import joblib
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from typing import Iterable, Tuple
+from sksurv.metrics import brier_score
+
+from decision_utils import (
+    class_probs_from_S_tau_matrix,
+    evaluate_decision_costs_from_true
+)
+
+# -------------------------
+# Survival-Matrix (Cache)
+# -------------------------
+
+def compute_survival_matrix(
+    rsf,
+    X_test: pd.DataFrame,
+    cache_dir: str = "../data/07_model_output/RSF/survival_cache",
+    batch_size: int = 1024,
+    overwrite: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Berechnet die Survival-Matrix S(t) des Testsets einmalig und legt sie als Memory-Map ab.
+
+    Die Matrix wird auf dem Zeitraster ``rsf.unique_times_`` gespeichert
+    (``survival_matrix.npy``, ``survival_times.npy``). Daneben liegt ein
+    Fingerprint aus Modell- und Daten-Hash (``survival_fingerprint.json``); nur
+    wenn dieser übereinstimmt, wird der Cache ohne Modellaufruf geladen. Der
+    Fingerprint wird erst nach vollständig geschriebener Matrix abgelegt, sodass
+    ein abgebrochener Lauf beim nächsten Aufruf neu berechnet wird.
+
+    Args:
+        rsf: Trainiertes Random Survival Forest Modell (scikit-survival).
+        X_test (pd.DataFrame): Test-Features. Spaltenreihenfolge wird an
+            rsf.feature_names_in_ angepasst, falls vorhanden.
+        cache_dir (str): Zielordner für den Cache.
+        batch_size (int): Anzahl Samples pro Modellaufruf beim Befüllen der Matrix.
+        overwrite (bool): Cache neu berechnen, auch wenn er bereits existiert.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]:
+            - Survival-Matrix (n_samples, n_times) als schreibgeschützte Memory-Map
+            - Zeitraster (n_times,)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    matrix_path = os.path.join(cache_dir, "survival_matrix.npy")
+    times_path = os.path.join(cache_dir, "survival_times.npy")
+    fingerprint_path = os.path.join(cache_dir, "survival_fingerprint.json")
+
+    if hasattr(rsf, "feature_names_in_"):
+        X_test = X_test.loc[:, rsf.feature_names_in_]
+
+    times = np.asarray(rsf.unique_times_, dtype=float)
+    shape = (len(X_test), len(times))
+    fingerprint = {
+        "model": joblib.hash(rsf),
+        "data": joblib.hash(X_test),
+        "shape": list(shape),
+    }
+
+    if not overwrite and all(os.path.exists(p) for p in (matrix_path, times_path, fingerprint_path)):
+        with open(fingerprint_path, "r", encoding="utf-8") as f:
+            cached_fingerprint = json.load(f)
+        if cached_fingerprint == fingerprint:
+            return np.load(matrix_path, mmap_mode="r"), np.load(times_path)
+
+    # Alten Fingerprint zuerst entfernen, neue Matrix in Temp-Datei füllen und atomar ersetzen
+    if os.path.exists(fingerprint_path):
+        os.remove(fingerprint_path)
+
+    tmp_path = matrix_path + ".tmp"
+    S = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=shape)
+    for start in range(0, shape[0], batch_size):
+        stop = min(start + batch_size, shape[0])
+        S[start:stop] = rsf.predict_survival_function(X_test.iloc[start:stop], return_array=True)
+    S.flush()
+    del S
+    os.replace(tmp_path, matrix_path)
+
+    np.save(times_path, times)
+    with open(fingerprint_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprint, f, indent=2)
+
+    return np.load(matrix_path, mmap_mode="r"), times
+
+
+def survival_at_times(S: np.ndarray, grid: np.ndarray, times: Iterable[float]) -> np.ndarray:
+    """Wertet die gecachten Survival-Stufenfunktionen an beliebigen Zeitpunkten aus.
+
+    Verhält sich wie ``sksurv.functions.StepFunction``: Zeitpunkte vor dem ersten
+    Rasterpunkt erhalten den ersten Wert, Zeitpunkte außerhalb von [0, grid[-1]]
+    führen zu einem ValueError.
+
+    Args:
+        S (np.ndarray): Survival-Matrix (n_samples, n_grid).
+        grid (np.ndarray): Zeitraster der Matrix (aufsteigend sortiert).
+        times (Iterable[float]): Auszuwertende Zeitpunkte.
+
+    Returns:
+        np.ndarray: Überlebenswahrscheinlichkeiten der Form (n_samples, len(times)).
+    """
+    times = np.asarray(list(times), dtype=float)
+    if times.size and (times.min() < 0 or times.max() > grid[-1]):
+        raise ValueError(f"Zeitpunkte müssen in [0; {grid[-1]}] liegen.")
+
+    idx = np.clip(np.searchsorted(grid, times, side="right") - 1, 0, None)
+    return np.asarray(S[:, idx], dtype=float)
+
+
+# -------------------------
+# Brier Score
+# -------------------------
+
+def brier_score_from_survival_matrix(
+    S: np.ndarray,
+    grid: np.ndarray,
+    y_train_surv: np.ndarray,
+    y_test_surv: np.ndarray,
+    output_dir: str = "../data/07_model_output/RSF",
+    time_grid: Iterable[float] | None = None,
+    n_grid: int = 100
+) -> dict:
+    """Berechnet Brier Scores und den integrierten Brier Score (IBS) aus der Survival-Matrix.
+
+    Args:
+        S (np.ndarray): Survival-Matrix (n_samples, n_grid) des Testsets.
+        grid (np.ndarray): Zeitraster der Matrix.
+        y_train_surv (np.ndarray): Train-Survivaldaten (für Zensurgewichtung).
+        y_test_surv (np.ndarray): Test-Survivaldaten.
+        output_dir (str): Zielordner für ``brier_score.json``.
+        time_grid (Iterable[float] | None): Optionale Zeitpunkte. Wenn None →
+            gleichmäßig von 1 bis tau.
+        n_grid (int): Anzahl der Punkte für das Zeitraster.
+
+    Returns:
+        dict mit IBS, tau, times, brier_scores und Pfad zur JSON-Datei.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Tau = maximaler Eventzeitpunkt im Test (keine Zensur)
+    tau = float(y_test_surv["time"][y_test_surv["event"]].max())
+
+    if time_grid is None:
+        times = np.linspace(1.0, tau, n_grid)
+    else:
+        times = np.asarray(list(time_grid), dtype=float)
+        times = times[times < tau]
+
+    times_out, bs_mean = brier_score(y_train_surv, y_test_surv, survival_at_times(S, grid, times), times)
+    ibs = float(np.trapz(bs_mean, times_out) / (times_out[-1] - times_out[0]))
+
+    results = {
+        "ibs": ibs,
+        "tau": tau,
+        "times": times_out.tolist(),
+        "brier_scores": bs_mean.tolist(),
+    }
+
+    out_path = os.path.join(output_dir, "brier_score.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    results["path"] = out_path
+    return results
+
+
+# -------------------------
+# Survival-Kurven pro Klasse
+# -------------------------
+
+def mean_survival_curves_per_class(
+    S: np.ndarray,
+    grid: np.ndarray,
+    true_class: pd.Series | np.ndarray
+) -> pd.DataFrame:
+    """Mittelt die Survival-Kurven aller Test-Samples je wahrer Klasse.
+
+    Args:
+        S (np.ndarray): Survival-Matrix (n_samples, n_grid).
+        grid (np.ndarray): Zeitraster der Matrix.
+        true_class (pd.Series | np.ndarray): Wahre Klassenlabels {0..4}.
+
+    Returns:
+        pd.DataFrame: Mittlere Survival-Kurven (Zeilen = Klassen, Spalten = Zeitpunkte).
+    """
+    true_class = np.asarray(true_class, dtype=int)
+    classes = np.unique(true_class)
+    curves = np.vstack([np.asarray(S[true_class == c]).mean(axis=0) for c in classes])
+    return pd.DataFrame(curves, index=pd.Index(classes, name="class_label"), columns=grid)
+
+
+def plot_mean_survival_curves_per_class(
+    curves: pd.DataFrame,
+    output_path: str = "../data/08_reporting/rsf_mean_survival_per_class.png"
+) -> None:
+    """Plottet die mittleren Survival-Kurven je Klasse und speichert die Grafik.
+
+    Args:
+        curves (pd.DataFrame): Ergebnis von ``mean_survival_curves_per_class``.
+        output_path (str): Pfad zum Speichern der Grafik.
+    """
+    plt.figure(figsize=(8, 5))
+    for c, row in curves.iterrows():
+        plt.step(curves.columns.to_numpy(dtype=float), row.to_numpy(), where="post", label=f"class {c}")
+
+    plt.ylabel("Survival probability")
+    plt.xlabel("Time (same unit as training)")
+    plt.title("RSF – Mittlere Survival functions pro Klasse")
+    plt.legend()
+    plt.grid(True)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    plt.savefig(output_path, dpi=300)
+    plt.close()
+
+
+# -------------------------
+# Entscheidungen (Kosten / Argmax)
+# -------------------------
+
+def evaluate_and_save_decision_from_survival_matrix(
+    S: np.ndarray,
+    grid: np.ndarray,
+    true_class: pd.Series | np.ndarray,
+    taus: np.ndarray,
+    cost: np.ndarray,
+    method: str = "cost",
+    output_dir: str = "../data/07_model_output/RSF",
+    save_probs: bool = False,
+    survix: str | None = None
+) -> dict:
+    """Trifft kosten- oder argmax-basierte Entscheidungen aus der Survival-Matrix und speichert Artefakte.
+
+    Args:
+        S (np.ndarray): Survival-Matrix (n_samples, n_grid).
+        grid (np.ndarray): Zeitraster der Matrix.
+        true_class (pd.Series | np.ndarray): Wahre Klassenlabels {0..4}.
+        taus (np.ndarray): Klassengrenzen [tau1..tau4].
+        cost (np.ndarray): Kostenmatrix (5x5).
+        method (str): "cost" (minimale erwartete Kosten) oder "argmax".
+        output_dir (str): Zielordner für Artefakte.
+        save_probs (bool): Ob die Klassenwahrscheinlichkeiten gespeichert werden sollen.
+        survix (str | None): Suffix für Dateinamen. Defaults to ``method``.
+
+    Returns:
+        dict mit Pfaden und Kennzahlen.
+    """
+    if method not in ("cost", "argmax"):
+        raise ValueError(f"Unbekannte Methode: {method}")
+    survix = survix or method
+    os.makedirs(output_dir, exist_ok=True)
+
+    probs = class_probs_from_S_tau_matrix(survival_at_times(S, grid, taus))
+    if method == "cost":
+        pred_class = (probs @ cost).argmin(axis=1).astype(int)
+    else:
+        pred_class = probs.argmax(axis=1).astype(int)
+
+    avg_cost, total_cost, cm, accuracy = evaluate_decision_costs_from_true(true_class, pred_class, cost)
+
+    metrics_path = os.path.join(output_dir, f"metrics_{survix}.json")
+    cm_path = os.path.join(output_dir, f"confusion_matrix_{survix}.csv")
+    probs_path = os.path.join(output_dir, f"class_probs_{survix}.csv")
+
+    metrics = {
+        "avg_realised_cost": float(avg_cost),
+        "total_realised_cost": float(total_cost),
+        "accuracy": float(accuracy),
+        "n_instances": int(len(pred_class)),
+        "taus": list(map(float, taus)),
+    }
+    with open(metrics_path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+
+    pd.DataFrame(cm, index=[0, 1, 2, 3, 4], columns=[0, 1, 2, 3, 4]).to_csv(cm_path, index=True)
+
+    if save_probs:
+        pd.DataFrame(probs, columns=[f"p{c}" for c in range(5)]).to_csv(probs_path, index=False)
+
+    return {
+        "metrics_path": metrics_path,
+        "confusion_matrix_path": cm_path,
+        "class_probs_path": probs_path if save_probs else None,
+        "avg_realised_cost": float(avg_cost),
+        "total_realised_cost": float(total_cost),
+        "accuracy": float(accuracy),
+    }
+
+
+# -------------------------
+# Kalibrierung
+# -------------------------
+
+def calibration_table_from_survival_matrix(
+    S: np.ndarray,
+    grid: np.ndarray,
+    y_test_surv: np.ndarray,
+    taus: np.ndarray,
+    n_bins: int = 10
+) -> pd.DataFrame:
+    """Erstellt Kalibrierungstabellen der Ausfallwahrscheinlichkeit 1 - S(tau) je Klassengrenze.
+
+    Pro tau werden die Samples nach vorhergesagter Ausfallwahrscheinlichkeit in
+    gleich breite Bins eingeteilt und mit der beobachteten Ausfallrate verglichen.
+    Samples, die vor tau zensiert wurden, haben keinen bekannten Status und werden
+    für das jeweilige tau ausgeschlossen.
+
+    Args:
+        S (np.ndarray): Survival-Matrix (n_samples, n_grid).
+        grid (np.ndarray): Zeitraster der Matrix.
+        y_test_surv (np.ndarray): Test-Survivaldaten mit Feldern "event" und "time".
+        taus (np.ndarray): Klassengrenzen [tau1..tau4].
+        n_bins (int): Anzahl der Wahrscheinlichkeits-Bins.
+
+    Returns:
+        pd.DataFrame: Spalten ['tau', 'bin', 'n', 'mean_predicted', 'observed_rate'].
+    """
+    event = np.asarray(y_test_surv["event"], dtype=bool)
+    time = np.asarray(y_test_surv["time"], dtype=float)
+    p_fail = 1.0 - survival_at_times(S, grid, taus)
+    edges = np.linspace(0.0, 1.0, n_bins + 1)
+    # Letzter Bin ist geschlossen, da p_fail == 1.0 ebenfalls hineinfällt
+    bin_labels = [f"[{lo:.1f}, {hi:.1f})" for lo, hi in zip(edges[:-2], edges[1:-1])]
+    bin_labels.append(f"[{edges[-2]:.1f}, {edges[-1]:.1f}]")
+
+    rows = []
+    for j, tau in enumerate(np.asarray(taus, dtype=float)):
+        failed = event & (time <= tau)
+        known = failed | (time > tau)
+        bins = np.clip(np.digitize(p_fail[known, j], edges[1:-1]), 0, n_bins - 1)
+        n = np.bincount(bins, minlength=n_bins)
+        pred_sum = np.bincount(bins, weights=p_fail[known, j], minlength=n_bins)
+        obs_sum = np.bincount(bins, weights=failed[known].astype(float), minlength=n_bins)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rows.append(pd.DataFrame({
+                "tau": tau,
+                "bin": bin_labels,
+                "n": n,
+                "mean_predicted": pred_sum / n,
+                "observed_rate": obs_sum / n,
+            }))
+
+    return pd.concat(rows, ignore_index=True)
+
+
+# -------------------------
+# Gesamtevaluation
+# -------------------------
+
+def run_rsf_evaluation_from_cache(
+    rsf,
+    X_test: pd.DataFrame,
+    y_train_surv: np.ndarray,
+    y_test_surv: np.ndarray,
+    true_class: pd.Series | np.ndarray,
+    taus: np.ndarray,
+    cost: np.ndarray,
+    output_dir: str = "../data/07_model_output/RSF",
+    reporting_dir: str = "../data/08_reporting",
+    save_probs: bool = True,
+    overwrite_cache: bool = False
+) -> dict:
+    """Führt die komplette RSF-Evaluation auf Basis einer einzigen gecachten Survival-Matrix durch.
+
+    Nur beim ersten Aufruf (oder mit ``overwrite_cache``) wird das Modell ausgewertet;
+    Änderungen an Kostenmatrix oder taus benötigen danach keinen Modelldurchlauf mehr.
+
+    Args:
+        rsf: Trainiertes Random Survival Forest Modell.
+        X_test (pd.DataFrame): Test-Features.
+        y_train_surv (np.ndarray): Train-Survivaldaten (für Zensurgewichtung).
+        y_test_surv (np.ndarray): Test-Survivaldaten.
+        true_class (pd.Series | np.ndarray): Wahre Klassenlabels {0..4}.
+        taus (np.ndarray): Klassengrenzen [tau1..tau4].
+        cost (np.ndarray): Kostenmatrix (5x5).
+        output_dir (str): Zielordner für Modelloutputs und Cache.
+        reporting_dir (str): Zielordner für Grafiken und Tabellen.
+        save_probs (bool): Ob die Klassenwahrscheinlichkeiten gespeichert werden sollen.
+        overwrite_cache (bool): Survival-Matrix neu berechnen.
+
+    Returns:
+        dict mit den Ergebnissen der einzelnen Auswertungen.
+    """
+    S, grid = compute_survival_matrix(
+        rsf, X_test, cache_dir=os.path.join(output_dir, "survival_cache"), overwrite=overwrite_cache
+    )
+    os.makedirs(reporting_dir, exist_ok=True)
+
+    results_brier = brier_score_from_survival_matrix(S, grid, y_train_surv, y_test_surv, output_dir=output_dir)
+
+    curves = mean_survival_curves_per_class(S, grid, true_class)
+    curves_path = os.path.join(output_dir, "mean_survival_per_class.csv")
+    curves.to_csv(curves_path)
+    plot_path = os.path.join(reporting_dir, "rsf_mean_survival_per_class.png")
+    plot_mean_survival_curves_per_class(curves, output_path=plot_path)
+
+    calibration = calibration_table_from_survival_matrix(S, grid, y_test_surv, taus)
+    calibration_path = os.path.join(reporting_dir, "rsf_calibration_table.csv")
+    calibration.to_csv(calibration_path, index=False)
+
+    results_cost = evaluate_and_save_decision_from_survival_matrix(
+        S, grid, true_class, taus, cost, method="cost", output_dir=output_dir, save_probs=save_probs
+    )
+    results_argmax = evaluate_and_save_decision_from_survival_matrix(
+        S, grid, true_class, taus, cost, method="argmax", output_dir=output_dir, save_probs=save_probs
+    )
+
+    return {
+        "brier": results_brier,
+        "cost": results_cost,
+        "argmax": results_argmax,
+        "mean_survival_per_class_path": curves_path,
+        "mean_survival_per_class_plot": plot_path,
+        "calibration_table_path": calibration_path,
+    }
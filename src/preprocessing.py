@@ -67,6 +67,7 @@ def create_all_fixed_time_index_windows(readouts_df: pd.DataFrame, window_sizes:
     """
     base_cols = ["vehicle_id", "time_step"]
     sensor_cols = [c for c in readouts_df.columns if c not in base_cols]
+    window_sizes = list(dict.fromkeys(window_sizes))
 
     melted = readouts_df.melt(
         id_vars=base_cols,
@@ -76,39 +77,45 @@ def create_all_fixed_time_index_windows(readouts_df: pd.DataFrame, window_sizes:
     )
 
     melted = melted.sort_values(["vehicle_id", "time_step"], kind="mergesort", ignore_index=True)
-    out_parts: list[pd.DataFrame] = []
 
-    for w in window_sizes:
-        for vid, g in melted.groupby("vehicle_id"):
-            t = g["time_step"].to_numpy()
-            uniq_t = np.unique(t)
-            starts = np.searchsorted(t, uniq_t - w, side="right")
-            ends   = np.searchsorted(t, uniq_t, side="left")
+    # Einmal gruppieren, Zeilenindizes für alle Fenstergrößen sammeln (Reihenfolge: w → Fahrzeug → Zeit)
+    idx_parts: dict[float, list[np.ndarray]] = {w: [] for w in window_sizes}
+    id_parts: dict[float, list[np.ndarray]] = {w: [] for w in window_sizes}
+    ct_parts: dict[float, list[np.ndarray]] = {w: [] for w in window_sizes}
+
+    for vid, g in melted.groupby("vehicle_id", sort=False):
+        rows = g.index.to_numpy()
+        t = g["time_step"].to_numpy()
+        uniq_t = np.unique(t)
+        ends = np.searchsorted(t, uniq_t, side="left")
 
-            added = False  # Track, ob überhaupt ein Fenster erzeugt wurde
+        for w in window_sizes:
+            starts = np.searchsorted(t, uniq_t - w, side="right")
+            valid = ends > starts
 
-            for i_start, i_end, ct in zip(starts, ends, uniq_t):
-                if i_end <= i_start:
-                    continue
-                win_slice = g.iloc[i_start:i_end].copy()
-                win_slice["id"] = f"vid{vid}_t{ct}_w{w}"
-                win_slice["time_step_current"] = np.float64(ct)
-                out_parts.append(win_slice)
-                added = True
+            if valid.any():
+                s, e, cts = starts[valid], ends[valid], uniq_t[valid]
+                lengths = e - s
+                offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                idx_parts[w].append(rows[np.repeat(s, lengths) + offsets])
+                id_parts[w].append(np.repeat(np.array([f"vid{vid}_t{ct}_w{w}" for ct in cts], dtype=object), lengths))
+                ct_parts[w].append(np.repeat(cts.astype(np.float64), lengths))
 
             # Fallback: nur ein Readout – trotzdem aufnehmen
-            if not added and len(g["time_step"].unique()) == 1:
-                ct = g["time_step"].iloc[0]
-                win_slice = g.copy()
-                win_slice["id"] = f"vid{vid}_t{ct}_w{w}_fallback"
-                win_slice["time_step_current"] = np.float64(ct)
-                out_parts.append(win_slice)
-
-    if not out_parts:
+            elif len(uniq_t) == 1:
+                ct = t[0]
+                idx_parts[w].append(rows)
+                id_parts[w].append(np.full(len(rows), f"vid{vid}_t{ct}_w{w}_fallback", dtype=object))
+                ct_parts[w].append(np.full(len(rows), np.float64(ct)))
+
+    if not any(idx_parts[w] for w in window_sizes):
         print("⚠️ Keine Fenster erzeugt – auch kein Fallback möglich.")
         return pd.DataFrame()
 
-    final = pd.concat(out_parts, ignore_index=True)
+    final = melted.take(np.concatenate([a for w in window_sizes for a in idx_parts[w]]))
+    final = final.reset_index(drop=True)
+    final["id"] = np.concatenate([a for w in window_sizes for a in id_parts[w]])
+    final["time_step_current"] = np.concatenate([a for w in window_sizes for a in ct_parts[w]])
     return final[["id", "vehicle_id", "time_step", "time_step_current", "kind", "value"]]
 
 
@@ -158,6 +165,195 @@ def extract_tsfresh_features(df_windows: pd.DataFrame, n_workers: int = 4) -> pd
     return features_df
 
 
+def _window_min_max(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Berechnet Minimum und Maximum für beliebige Zeilenbereiche [start, end) über eine Sparse Table.
+
+    Args:
+        values (np.ndarray): Sensorwerte eines Fahrzeugs (n_zeilen, n_sensoren).
+        starts (np.ndarray): Startindizes der Fenster (inklusive).
+        ends (np.ndarray): Endindizes der Fenster (exklusive), jeweils > start.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Minima und Maxima der Form (n_fenster, n_sensoren).
+    """
+    lengths = ends - starts
+    levels = np.floor(np.log2(lengths)).astype(int)
+    mins, maxs = np.empty((len(starts), values.shape[1])), np.empty((len(starts), values.shape[1]))
+
+    table_min, table_max = values, values
+    for j in range(levels.max() + 1):
+        if j > 0:
+            half = 1 << (j - 1)
+            table_min = np.minimum(table_min[:-half], table_min[half:])
+            table_max = np.maximum(table_max[:-half], table_max[half:])
+        sel = levels == j
+        if sel.any():
+            left, right = starts[sel], ends[sel] - (1 << j)
+            mins[sel] = np.minimum(table_min[left], table_min[right])
+            maxs[sel] = np.maximum(table_max[left], table_max[right])
+
+    return mins, maxs
+
+
+def _window_medians(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Berechnet Mediane für beliebige Zeilenbereiche [start, end), gebündelt nach Fensterlänge.
+
+    Args:
+        values (np.ndarray): Sensorwerte eines Fahrzeugs (n_zeilen, n_sensoren).
+        starts (np.ndarray): Startindizes der Fenster (inklusive).
+        ends (np.ndarray): Endindizes der Fenster (exklusive), jeweils > start.
+
+    Returns:
+        np.ndarray: Mediane der Form (n_fenster, n_sensoren).
+    """
+    lengths = ends - starts
+    medians = np.empty((len(starts), values.shape[1]))
+    for length in np.unique(lengths):
+        sel = lengths == length
+        windows = np.lib.stride_tricks.sliding_window_view(values, int(length), axis=0)
+        medians[sel] = np.median(windows[starts[sel]], axis=-1)
+    return medians
+
+
+def extract_multi_scale_window_features(readouts_df: pd.DataFrame, window_sizes: list[float]) -> pd.DataFrame:
+    """Berechnet die Fenster-Aggregate für mehrere Fenstergrößen in einem Durchlauf.
+
+    Entspricht ``extract_tsfresh_features(create_all_fixed_time_index_windows(...))``
+    (gleiche IDs, Spaltennamen, Spalten- und Zeilenreihenfolge), arbeitet aber direkt
+    auf den sortierten Readouts im Wide-Format. Pro Fahrzeug werden Präfixsummen
+    (für mean/standard_deviation) und eine Sparse Table (für minimum/maximum) einmal
+    aufgebaut und für alle Fenstergrößen per Indexzugriff ausgewertet; Mediane werden
+    gebündelt nach Fensterlänge berechnet. Zeilenbereiche, die bei mehreren
+    Fenstergrößen identisch sind, werden nur einmal ausgewertet.
+
+    Args:
+        readouts_df (pd.DataFrame): Eingabedaten mit Spalten
+            ['vehicle_id', 'time_step', <Sensorspalten>].
+        window_sizes (list[float]): Liste der Fenstergrößen (z. B. [8, 16, 32]).
+
+    Returns:
+        pd.DataFrame: Feature-Datenframe (Index 'id') mit den Merkmalen
+        mean, median, standard_deviation, minimum und maximum pro Sensor,
+        inkl. Meta-Infos ['vehicle_id', 'time_step'].
+    """
+    base_cols = ["vehicle_id", "time_step"]
+    sensor_cols = sorted(c for c in readouts_df.columns if c not in base_cols)
+    window_sizes = list(dict.fromkeys(window_sizes))
+
+    if not window_sizes:
+        print("⚠️ Keine Fenster erzeugt – auch kein Fallback möglich.")
+        return pd.DataFrame()
+
+    df = readouts_df.sort_values(base_cols, kind="mergesort", ignore_index=True)
+    vehicle_ids = df["vehicle_id"].to_numpy()
+    time_steps = df["time_step"].to_numpy()
+    all_values = df[sensor_cols].to_numpy(dtype=np.float64)
+    bounds_vehicle = np.flatnonzero(np.r_[True, vehicle_ids[1:] != vehicle_ids[:-1], True])
+
+    ids: dict[float, list[np.ndarray]] = {w: [] for w in window_sizes}
+    vids: dict[float, list[np.ndarray]] = {w: [] for w in window_sizes}
+    current_steps: dict[float, list[np.ndarray]] = {w: [] for w in window_sizes}
+    # Pro Fahrzeug und Fenstergröße eine (n_fenster, 5, n_sensoren)-Matrix: mean, median, standard_deviation, minimum, maximum
+    stats: dict[float, list[np.ndarray]] = {w: [] for w in window_sizes}
+
+    for lo, hi in zip(bounds_vehicle[:-1], bounds_vehicle[1:]):
+        vid = vehicle_ids[lo]
+        t = time_steps[lo:hi]
+        values = all_values[lo:hi]
+        uniq_t = np.unique(t)
+
+        # Fallback: nur ein Readout – Fenster über alle Zeilen
+        if len(uniq_t) == 1:
+            ct = t[0]
+            fallback_stats = np.stack([
+                values.mean(axis=0), np.median(values, axis=0), values.std(axis=0),
+                values.min(axis=0), values.max(axis=0),
+            ])[None]
+            for w in window_sizes:
+                ids[w].append(np.array([f"vid{vid}_t{ct}_w{w}_fallback"], dtype=object))
+                vids[w].append(np.array([vid]))
+                current_steps[w].append(np.array([ct], dtype=np.float64))
+                stats[w].append(fallback_stats)
+            continue
+
+        # Präfixsummen einmal pro Fahrzeug (zentriert, NaN separat gezählt)
+        nan_mask = np.isnan(values)
+        center = np.where(nan_mask, 0.0, values).sum(axis=0) / np.maximum((~nan_mask).sum(axis=0), 1)
+        centered = np.where(nan_mask, 0.0, values - center)
+        zeros = np.zeros((1, values.shape[1]))
+        csum = np.concatenate([zeros, np.cumsum(centered, axis=0)])
+        csq = np.concatenate([zeros, np.cumsum(centered * centered, axis=0)])
+        cnan = np.concatenate([zeros, np.cumsum(nan_mask, axis=0)])
+
+        ends = np.searchsorted(t, uniq_t, side="left")
+        bounds = {}
+        for w in window_sizes:
+            starts = np.searchsorted(t, uniq_t - w, side="right")
+            valid = ends > starts
+            if valid.any():
+                bounds[w] = (starts[valid], ends[valid], uniq_t[valid])
+        if not bounds:
+            continue
+
+        # Identische Zeilenbereiche verschiedener Fenstergrößen nur einmal auswerten
+        pairs, inverse = np.unique(
+            np.concatenate([np.column_stack(bounds[w][:2]) for w in bounds]), axis=0, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        s, e = pairs[:, 0], pairs[:, 1]
+        n = (e - s)[:, None].astype(float)
+
+        mean = (csum[e] - csum[s]) / n + center
+        mean_sq = (csq[e] - csq[s]) / n
+        var = mean_sq - (mean - center) ** 2
+        std = np.sqrt(np.maximum(var, 0.0))
+
+        # Auslöschung (z. B. nach Niveausprüngen oder bei konstanten Fenstern): exakt nachrechnen
+        single = e - s == 1
+        mean[single] = values[s[single]]
+        std[single] = 0.0
+        lost = (var <= 1e-8 * np.maximum(mean_sq, csq[e] / n)) & ~single[:, None]
+        for i in np.flatnonzero(lost.any(axis=1)):
+            cols = lost[i]
+            window = values[s[i]:e[i], cols]
+            mean[i, cols] = window.mean(axis=0)
+            std[i, cols] = window.std(axis=0)
+
+        has_nan = (cnan[e] - cnan[s]) > 0
+        mean[has_nan] = np.nan
+        std[has_nan] = np.nan
+        mins, maxs = _window_min_max(values, s, e)
+        medians = _window_medians(values, s, e)
+        pair_stats = np.stack([mean, medians, std, mins, maxs], axis=1)
+
+        pos = 0
+        for w, (_, _, cts) in bounds.items():
+            ids[w].append(np.array([f"vid{vid}_t{ct}_w{w}" for ct in cts], dtype=object))
+            vids[w].append(np.full(len(cts), vid))
+            current_steps[w].append(cts.astype(np.float64))
+            stats[w].append(pair_stats[inverse[pos:pos + len(cts)]])
+            pos += len(cts)
+
+    if not any(ids[w] for w in window_sizes):
+        print("⚠️ Keine Fenster erzeugt – auch kein Fallback möglich.")
+        return pd.DataFrame()
+
+    feature_names = ["mean", "median", "standard_deviation", "minimum", "maximum"]
+    columns = [f"{kind}__{name}" for kind in sensor_cols for name in feature_names]
+    # (n_fenster, 5, n_sensoren) → (n_fenster, n_sensoren, 5), damit die Spalten pro Sensor gruppiert sind
+    data = np.concatenate([a for w in window_sizes for a in stats[w]]).transpose(0, 2, 1)
+
+    all_ids = np.concatenate([a for w in window_sizes for a in ids[w]])
+    features_df = pd.DataFrame(
+        data.reshape(len(all_ids), -1), index=pd.Index(all_ids, name="id"), columns=columns
+    )
+    impute(features_df)
+
+    features_df["vehicle_id"] = np.concatenate([a for w in window_sizes for a in vids[w]])
+    features_df["time_step"] = np.concatenate([a for w in window_sizes for a in current_steps[w]])
+    return features_df.sort_index()
+
+
 # -------------------------
 # Feature Selection
 # -------------------------